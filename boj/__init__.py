@@ -5,16 +5,14 @@ a module for logging in, submitting, getting stats from BOJ
 """
 
 import argparse
-import configparser
 import getpass
+import json
 import logging
 import logging.handlers
 import os
-import pickle
 import re
-import requests
+import time
 
-from bs4 import BeautifulSoup as bs
 from colorama import init, Fore, Back, Style
 from xdg import (XDG_CONFIG_HOME, XDG_DATA_HOME)
 
@@ -27,12 +25,71 @@ config_dir = XDG_CONFIG_HOME + '/boj-tool'
 boj_url = 'https://www.acmicpc.net'
 cookiefile_path = data_dir + '/cookiefile'
 configfile_path = config_dir + '/config'
-sess = requests.Session()
+_sess = None
 
 logger = logging.getLogger('boj-tool')
 streamHandler = logging.StreamHandler()
 logger.addHandler(streamHandler)
-config = configparser.ConfigParser()
+_CFG = {}
+_cached_username = None
+
+_SECTION_RE = re.compile(r'^[ \t]*\[([^\]]+)\][ \t]*$', re.M)
+_KV_RE = re.compile(
+    r'^[ \t]*([^=:\s#;][^=:\n]*?)[ \t]*[=:][ \t]*(.*?)[ \t]*$', re.M)
+_RESULT_RE = re.compile(
+    r'<span class="result-text[^"]*"[^>]*>\s*<span[^>]*>([^<]+)</span>')
+_MEM_RE = re.compile(r'<td class="memory"[^>]*>([^<]*)')
+_TIME_RE = re.compile(r'<td class="time"[^>]*>([^<]*)')
+_CSRF_RE = re.compile(
+    r'\sname=["\']csrf_key["\'][^>]*\svalue=["\']([^"\']+)["\']'
+    r'|\svalue=["\']([^"\']+)["\'][^>]*\sname=["\']csrf_key["\']')
+_PARTIAL_RE = re.compile(r'^\d+점$')
+_DIGITS_RE = re.compile(r'\d+')
+_TAB_NL_RE = re.compile(r'[\t\n]+')
+_CLEAR_LINE = '\r' + ' ' * 20
+_PREPARING_MSG = Fore.YELLOW + 'Preparing...' + Style.RESET_ALL
+_JUDGING_MSG = Fore.YELLOW + 'Judging...'
+_PARTIAL_TMPL = Fore.YELLOW + 'Partial ({0})' + Style.RESET_ALL
+_AC_TMPL = Fore.GREEN + 'AC ({0}KB, {1}ms)' + Style.RESET_ALL
+_MSG_TABLE = {
+    '출력 형식이 잘못되었습니다': Fore.RED + 'PE' + Style.RESET_ALL,
+    '틀렸습니다': Fore.RED + 'WA' + Style.RESET_ALL,
+    '시간 초과': Fore.RED + 'TLE' + Style.RESET_ALL,
+    '메모리 초과': Fore.RED + 'MLE' + Style.RESET_ALL,
+    '출력 초과': Fore.RED + 'PLE' + Style.RESET_ALL,
+    '런타임 에러': Fore.BLUE + 'RTE' + Style.RESET_ALL,
+    '컴파일 에러': Fore.BLUE + 'Compile Error' + Style.RESET_ALL,
+    '기다리는 중': Fore.YELLOW + 'Waiting...' + Style.RESET_ALL
+}
+_FINISHED_MSGS = {
+    '맞았습니다!!',
+    '출력 형식이 잘못되었습니다', '틀렸습니다', '시간 초과',
+    '메모리 초과', '출력 초과', '런타임 에러', '컴파일 에러'
+}
+
+
+def _get_session():
+    """
+    function _get_session -- gets the global session object
+
+    requests is imported and the session is created on first use, so commands
+    that never touch the network (e.g. version) start faster.
+    """
+    global _sess
+    if _sess is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.request import ACCEPT_ENCODING
+        from urllib3.util.retry import Retry
+
+        _sess = requests.Session()
+        _sess.mount('https://', HTTPAdapter(
+            pool_connections=2, pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=[502, 503, 504])))
+        # urllib3 >= 1.25 adds 'br' when brotli is available to decode it
+        _sess.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return _sess
 
 
 def initialize():
@@ -48,7 +105,30 @@ def initialize():
         logger.debug('Created directory for cookiefile')
     if os.path.isfile(configfile_path):
         logger.debug('Config file found')
-        config.read(configfile_path)
+        _CFG.update(read_config(configfile_path))
+
+
+def read_config(path):
+    """
+    function read_config -- reads config file into dicts
+
+    The config file only holds flat 'Key=Value' pairs under '[Section]'
+    headers, so it is parsed with two regexes instead of configparser. Like
+    configparser, keys are lowercased, indentation is ignored and [DEFAULT]
+    values apply to every section. Unlike it, continuation lines, inline
+    comments and interpolation are not supported.
+
+    params:
+    path: str -- the path of the config file
+    """
+    with open(path, 'r') as f:
+        parts = _SECTION_RE.split(f.read())
+    sections = {section: {key.lower(): value
+                          for key, value in _KV_RE.findall(body)}
+                for section, body in zip(parts[1::2], parts[2::2])}
+    defaults = sections.pop('DEFAULT', {})
+    return {section: dict(defaults, **options)
+            for section, options in sections.items()}
 
 
 def auth_user(username, password):
@@ -63,9 +143,10 @@ def auth_user(username, password):
             'login_password': password,
             'auto_login': 'on'}
     logger.info('Authenticating...')
-    logger.debug('Username: {0}, Password: {1}'.format(username,
-                                                       '*' * len(password)))
-    sess.post(boj_url + '/signin', data=data)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Username: %s, Password: %s', username,
+                     '*' * len(password))
+    _get_session().post(boj_url + '/signin', data=data)
 
 
 def check_login():
@@ -74,7 +155,10 @@ def check_login():
 
     returns True if logged in, and False if not logged in.
     """
-    soup = bs(sess.get(boj_url).text, 'html.parser')
+    from bs4 import BeautifulSoup as bs, SoupStrainer
+
+    soup = bs(_get_session().get(boj_url).text, 'lxml',
+              parse_only=SoupStrainer('a', {'class': 'username'}))
     return soup.find('a', {'class': 'username'}) is not None
 
 
@@ -88,10 +172,15 @@ def save_cookie(session):
     params:
     session: request.Session -- the session object to extract cookie from
     """
-    with open(cookiefile_path, 'wb') as f:
-        logger.debug('Saving cookie to {0}...'.format(cookiefile_path))
-        pickle.dump(session.cookies, f)
-        logger.info('Saved cookie to {0}'.format(cookiefile_path))
+    cookies = [{'name': c.name, 'value': c.value, 'domain': c.domain,
+                'path': c.path, 'expires': c.expires, 'secure': c.secure,
+                'rest': ({'HttpOnly': None}
+                         if c.has_nonstandard_attr('HttpOnly') else {})}
+               for c in session.cookies]
+    with open(cookiefile_path, 'w') as f:
+        logger.debug('Saving cookie to %s...', cookiefile_path)
+        json.dump(cookies, f, separators=(',', ':'))
+        logger.info('Saved cookie to %s', cookiefile_path)
 
 
 def load_cookie():
@@ -102,10 +191,22 @@ def load_cookie():
     found. If not, the function calls login and asks user username and
     password.
     """
-    if os.path.isfile(data_dir + '/cookiefile'):
+    if os.path.isfile(cookiefile_path):
         logger.debug('Cookiefile found. Loading...')
-        with open(data_dir + '/cookiefile', 'rb') as f:
-            sess.cookies.update(pickle.load(f))
+        try:
+            with open(cookiefile_path, 'r') as f:
+                cookies = json.load(f)
+        except ValueError:
+            logger.error('Invalid cookiefile. Logging in...')
+            login()
+            return
+        sess = _get_session()
+        for cookie in cookies:
+            sess.cookies.set(**cookie)
+        if 'bojautologin' not in sess.cookies:
+            logger.error('No login cookie in cookiefile. Logging in...')
+            login()
+            return
         logger.info('Loaded cookiefile')
     else:
         logger.error('Cookiefile not found. Logging in...')
@@ -123,7 +224,7 @@ def login():
     username = input('Username: ')
     password = getpass.getpass()
     auth_user(username, password)
-    save_cookie(sess)
+    save_cookie(_get_session())
     if check_login():
         logger.info('Logged in')
     else:
@@ -144,9 +245,7 @@ def get_compiler(lang, default):
     lang: str -- the language to look up in the config file
     default: str -- the value to return if compiler was not found
     """
-    if 'Compiler' in config[lang]:
-        return config[lang]['Compiler']
-    return default
+    return _CFG.get(lang, {}).get('compiler', default)
 
 
 def get_version(lang, default):
@@ -160,9 +259,43 @@ def get_version(lang, default):
     lang: str -- the language to look up in the config file
     default: str -- the value to return if version was not found
     """
-    if 'Version' in config[lang]:
-        return config[lang]['Version']
-    return default
+    return _CFG.get(lang, {}).get('version', default)
+
+
+_EXT_ALIASES = {'.cc': '.cpp', '.c++': '.cpp'}
+_EXT_LANGS = {'.cpp': 'C++', '.c': 'C', '.py': 'Python', '.java': 'Java'}
+_STATIC_LANG_CODES = {'.txt': 58, '.js': 17, '.aheui': 83}
+# language: (default compiler, default version, code if not configured)
+_LANG_DEFAULTS = {
+    'C++': ('g++', 'C++14', 88), # default is C++14
+    'C': ('gcc', 'C11', 75), # default is C11
+    'Python': ('CPython', '3', 28), # default is CPython 3
+    'Java': ('Oracle', None, 3) # default is Java (oracle)
+}
+_VERSION_RES = {
+    'C++': re.compile(r'11|14|17'),
+    'C': re.compile(r'11|^C$'),
+    'Python': re.compile(r'[23]')
+}
+_LANG_CODES = {
+    ('C++', 'g++', '11'): 49,
+    ('C++', 'g++', '14'): 88,
+    ('C++', 'g++', '17'): 84,
+    ('C++', 'clang', '11'): 66,
+    ('C++', 'clang', '14'): 67,
+    ('C++', 'clang', '17'): 85,
+    ('C', 'gcc', '11'): 75,
+    ('C', 'gcc', 'C'): 0,
+    ('C', 'clang', '11'): 77,
+    ('C', 'clang', 'C'): 59,
+    ('Python', 'cpython', '2'): 6,
+    ('Python', 'cpython', '3'): 28,
+    ('Python', 'pypy', '2'): 32,
+    ('Python', 'pypy', '3'): 73,
+    ('Java', 'oracle', None): 3,
+    ('Java', 'openjdk', None): 91
+}
+_LANG_COMPILERS = {(lang, compiler) for lang, compiler, _ in _LANG_CODES}
 
 
 def get_lang_code(ext):
@@ -176,90 +309,29 @@ def get_lang_code(ext):
     param:
     ext: str -- the file extension to recognize language from
     """
-    if ext in ['.cc', '.cpp', '.c++']:
-        if 'C++' not in config:
-            return 88 # default is C++14
-        compiler = get_compiler('C++', default='g++')
-        version = get_version('C++', default='C++14')
-        if compiler.lower() == 'g++':
-            if '11' in version:
-                return 49
-            elif '14' in version:
-                return 88
-            elif '17' in version:
-                return 84
-            else:
-                logger.error('Invalid C++ version: {0}'.format(version))
-        elif compiler.lower() == 'clang':
-            if '11' in version:
-                return 66
-            elif '14' in version:
-                return 67
-            elif '17' in version:
-                return 85
-            else:
-                logger.error('Invalid C++ version: {0}'.format(version))
-        else:
-            logger.error('Invalid C++ compiler: {0}'.format(compiler))
-    elif ext == '.c':
-        if 'C' not in config:
-            return 75 # default is C11
-        compiler = get_compiler('C', default='gcc')
-        version = get_version('C', default='C11')
-        if compiler.lower() == 'gcc':
-            if '11' in version:
-                return 75
-            elif version == 'C':
-                return 0
-            else:
-                logger.error('Invalid C version: {0}'.format(version))
-        elif compiler.lower() == 'clang':
-            if '11' in version:
-                return 77
-            elif version == 'C':
-                return 59
-            else:
-                logger.error('Invalid C version: {0}'.format(version))
-        else:
-            logger.error('Invalid C compiler: {0}'.format(compiler))
-    elif ext == '.py':
-        if 'Python' not in config:
-            return 28 # default is CPython 3
-        compiler = get_compiler('Python', default='CPython')
-        version = get_version('Python', default='3')
-        if compiler.lower() == 'cpython':
-            if '2' in version:
-                return 6
-            elif '3' in version:
-                return 28
-            else:
-                logger.error('Invalid Python version: {0}'.format(version))
-        elif compiler.lower() == 'pypy':
-            if '2' in version:
-                return 32
-            elif '3' in version:
-                return 73
-            else:
-                logger.error('Invalid Python version: {0}'.format(version))
-        else:
-            logger.error('Invalid Python interpreter: {0}'.format(compiler))
-    elif ext == '.java':
-        if 'Java' not in config:
-            return 3 # default is Java (oracle)
-        compiler = get_compiler('Java', default='Oracle')
-        if compiler.lower() == 'oracle':
-            return 3
-        elif compiler.lower() == 'openjdk':
-            return 91
-        else:
-            logger.error('Invalid Java compiler: {0}'.format(compiler))
-    elif ext == '.txt':
-        return 58
-    elif ext == '.js':
-        return 17
-    elif ext == '.aheui':
-        return 83
-    return 88 # fallback
+    ext = _EXT_ALIASES.get(ext, ext)
+    if ext in _STATIC_LANG_CODES:
+        return _STATIC_LANG_CODES[ext]
+    lang = _EXT_LANGS.get(ext)
+    if lang is None:
+        return 88 # fallback
+    default_compiler, default_version, default_code = _LANG_DEFAULTS[lang]
+    if lang not in _CFG:
+        return default_code
+    compiler = get_compiler(lang, default=default_compiler)
+    version = get_version(lang, default=default_version)
+    if (lang, compiler.lower()) not in _LANG_COMPILERS:
+        logger.error('Invalid %s compiler: %s', lang, compiler)
+        return 88 # fallback
+    bucket = None
+    if lang in _VERSION_RES:
+        match = _VERSION_RES[lang].search(version)
+        bucket = match[0] if match is not None else None
+    code = _LANG_CODES.get((lang, compiler.lower(), bucket))
+    if code is None:
+        logger.error('Invalid %s version: %s', lang, version)
+        return 88 # fallback
+    return code
 
 
 def submit(number, filename):
@@ -273,13 +345,12 @@ def submit(number, filename):
     filename: str -- the filename to submit
     """
     load_cookie()
-    logger.debug('Problem number is {0}, filename is {1}'.format(number,
-                                                                 filename))
-    soup = bs(sess.get(boj_url + '/submit/' + str(number)).text, 'html.parser')
-    key = soup.find('input', {'name': 'csrf_key'})['value']
+    sess = _get_session()
+    logger.debug('Problem number is %s, filename is %s', number, filename)
+    match = _CSRF_RE.search(sess.get(boj_url + '/submit/' + str(number)).text)
+    key = match[1] or match[2]
     file_ext = os.path.splitext(filename)[1]
     language_code = get_lang_code(file_ext)
-    code = ''
     with open(filename, 'r') as f:
         code = f.read()
 
@@ -297,10 +368,17 @@ def get_username():
     """
     function get_username -- gets username from site's HTML
 
-    This function gets username from the site's HTML.
+    This function gets username from the site's HTML. The username is cached
+    after the first call since it does not change during a single run.
     """
-    soup = bs(sess.get(boj_url).text, 'html.parser')
-    return soup.find('a', {'class': 'username'}).get_text()
+    global _cached_username
+    if _cached_username is None:
+        from bs4 import BeautifulSoup as bs, SoupStrainer
+
+        soup = bs(_get_session().get(boj_url).text, 'lxml',
+                  parse_only=SoupStrainer('a', {'class': 'username'}))
+        _cached_username = soup.find('a', {'class': 'username'}).get_text()
+    return _cached_username
 
 
 def convert_msg(msg, mem=None, rtime=None):
@@ -313,27 +391,14 @@ def convert_msg(msg, mem=None, rtime=None):
     msg: str -- the message to convert
     """
     if '채점 준비 중' in msg:
-        msg = Fore.YELLOW + 'Preparing...' + Style.RESET_ALL
-        return msg
+        return _PREPARING_MSG
     elif '채점 중' in msg:
-        msg = msg.replace('채점 중', Fore.YELLOW + 'Judging...')
-        msg += Style.RESET_ALL
-        return msg
-    elif re.match(r'^\d+점$', msg) is not None:
-        msg = Fore.YELLOW + 'Partial ({0})'.format(re.match(r'\d+', msg)[0])
-        return msg + Style.RESET_ALL
-    conversion_table = {
-        '맞았습니다!!': Fore.GREEN + 'AC (%sKB, %sms)' % (mem, rtime),
-        '출력 형식이 잘못되었습니다': Fore.RED + 'PE',
-        '틀렸습니다': Fore.RED + 'WA',
-        '시간 초과': Fore.RED + 'TLE',
-        '메모리 초과': Fore.RED + 'MLE',
-        '출력 초과': Fore.RED + 'PLE',
-        '런타임 에러': Fore.BLUE + 'RTE',
-        '컴파일 에러': Fore.BLUE + 'Compile Error',
-        '기다리는 중': Fore.YELLOW + 'Waiting...'
-    }
-    return conversion_table[msg] + Style.RESET_ALL
+        return msg.replace('채점 중', _JUDGING_MSG) + Style.RESET_ALL
+    elif _PARTIAL_RE.match(msg) is not None:
+        return _PARTIAL_TMPL.format(_DIGITS_RE.match(msg)[0])
+    elif msg == '맞았습니다!!':
+        return _AC_TMPL.format(mem, rtime)
+    return _MSG_TABLE[msg]
 
 
 def check_finished(text):
@@ -346,14 +411,9 @@ def check_finished(text):
     params:
     text: str -- the text from BOJ site
     """
-    if re.fullmatch(r'^\d+점$', text):
+    if _PARTIAL_RE.fullmatch(text):
         return True
-    result = {
-        '맞았습니다!!',
-        '출력 형식이 잘못되었습니다', '틀렸습니다', '시간 초과',
-        '메모리 초과', '출력 초과', '런타임 에러', '컴파일 에러'
-    }
-    return text in result
+    return text in _FINISHED_MSGS
 
 
 def print_result(number):
@@ -365,21 +425,32 @@ def print_result(number):
     params:
     number: int -- the problem number to print result
     """
+    logger.debug('Getting username from HTML...')
+    username = get_username()
+    logger.debug('Username is %s', username)
+    result_url = boj_url + "/status?from_mine=1&problem_id=" + str(number) +\
+                "&user_id=" + username
+    sess = _get_session()
+    headers = {}
+    delay = 0.2
     done = False
     while not done:
-        logger.debug('Getting username from HTML...')
-        username = get_username()
-        logger.debug('Username is {0}'.format(username))
-        result_url = boj_url + "/status?from_mine=1&problem_id=" + str(number) +\
-                    "&user_id=" + username
-        soup = bs(sess.get(result_url).text, 'html.parser')
-        text = soup.find('span',
-                         {'class': 'result-text'}).find('span').string.strip()
-        mem = soup.find('td', {'class': 'memory'}).text
-        rtime = soup.find('td', {'class': 'time'}).text
-        print('\r' + ' ' * 20, end='')
-        print('\r{0}'.format(convert_msg(text, mem, rtime)), end='')
-        done = check_finished(text)
+        resp = sess.get(result_url, headers=headers)
+        if resp.status_code == 304:
+            logger.debug('Result not modified')
+        else:
+            if 'ETag' in resp.headers:
+                headers['If-None-Match'] = resp.headers['ETag']
+            if 'Last-Modified' in resp.headers:
+                headers['If-Modified-Since'] = resp.headers['Last-Modified']
+            text = _RESULT_RE.search(resp.text)[1].strip()
+            mem = _MEM_RE.search(resp.text)[1]
+            rtime = _TIME_RE.search(resp.text)[1]
+            print(f'{_CLEAR_LINE}\r{convert_msg(text, mem, rtime)}', end='')
+            done = check_finished(text)
+        if not done:
+            time.sleep(delay)
+            delay = min(1.0, delay * 1.5)
     print()
 
 
@@ -392,12 +463,15 @@ def stats(username):
     params:
     username: str -- user's name
     """
+    from bs4 import BeautifulSoup as bs, SoupStrainer
+
     load_cookie()
     if username is None:
         username = get_username()
     print('Stats of user {0}'.format(username))
     print()
-    soup = bs(sess.get(boj_url + '/user/' + username).text, 'html.parser')
+    soup = bs(_get_session().get(boj_url + '/user/' + username).text, 'lxml',
+              parse_only=SoupStrainer('table', {'id': 'statics'}))
     table_tr_elems = soup.find('table', {'id': 'statics'}).tbody.findAll('tr')
     conversion_table = {
         '랭킹': Fore.BLUE + 'Rank:\t\t' + Style.RESET_ALL,
@@ -416,11 +490,12 @@ def stats(username):
         '대회 준우승': Fore.CYAN + 'Second place:\t' + Style.RESET_ALL,
     }
     for tr_elem in table_tr_elems:
-        if tr_elem.th.get_text() in conversion_table:
-            print(conversion_table[tr_elem.th.get_text()], end='')
-            print(', '.join(
-                [s for s in re.split(r'\t|\n', tr_elem.td.get_text().strip())
-                 if s != '']))
+        label = conversion_table.get(tr_elem.th.get_text())
+        if label is None:
+            continue
+        print(label, end='')
+        print(', '.join(
+            [s for s in _TAB_NL_RE.split(tr_elem.td.get_text().strip()) if s]))
 
 
 def version():
@@ -6,8 +6,11 @@ from os import path
 
 py_modules = [
     'colorama',
-    'requests',
+    'requests>=2.22.0',
+    'urllib3>=1.25',
     'bs4',
+    'brotli',
+    'lxml',
     'xdg==3.0.2'
 ]
 